@@ -12,14 +12,21 @@ Defaults:
   - One machine: symbiotic/blr/line1/SF-01
   - Sampling every 10 seconds
   - Minimal signals: state, counters, run_minutes_today, motor_current_a
+  - State/counter rows only when the value changes, run_minutes_today once
+    per minute, motor_current_a every sample (--all-samples emits everything)
 """
 
 import argparse
 import csv
-import json
+import io
+import itertools
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-import random
+
+import numpy as np
+import pandas as pd
 
 def build_args():
     p = argparse.ArgumentParser(description="Generate simple IIoT dataset + replayer.")
@@ -30,13 +37,29 @@ def build_args():
     p.add_argument("--interval-sec", type=int, default=10, help="Sampling interval (seconds)")
     p.add_argument("--ideal-ct-s", type=float, default=12.0, help="Ideal cycle time per part (seconds)")
     p.add_argument("--reject-rate", type=float, default=0.02, help="Reject probability (0..1)")
+    p.add_argument("--seed", type=int, default=7, help="RNG seed (negative = fresh OS entropy)")
+    p.add_argument("--jobs", type=int, default=1, help="Worker processes for CSV serialization")
     p.add_argument("--outfile", default="simple_day.csv")
     p.add_argument("--replayer", default="simple_mqtt_replayer.py")
+    p.add_argument("--all-samples", action="store_true",
+                   help="Emit every signal at every sample instead of only on change")
     return p.parse_args()
 
-def frand(mu=0.0, sigma=1.0):
-    # simple normal-ish noise using random.gauss
-    return random.gauss(mu, sigma)
+def format_rows(columns, labels):
+    """Serialize one block of rows to UTF-8 CSV bytes.
+
+    columns: [ts_iso, topic, payload_json, object, metric] sequences
+    labels:  (site, line, machine), identical on every row
+    """
+    ts, topic, payload, object_, metric = columns
+    site, line, machine = labels
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerows(zip(
+        ts, topic, payload,
+        itertools.repeat(site), itertools.repeat(line), itertools.repeat(machine),
+        object_, metric,
+    ))
+    return buf.getvalue().encode("utf-8")
 
 def main():
     args = build_args()
@@ -57,188 +80,159 @@ def main():
 
     # Topic root
     root = f"symbiotic/{site}/{line}/{machine}"
-    def topic(object_, metric):
-        return f"{root}/{object_}/{metric}"
-
-    # Build timestamps
-    ts_list = []
-    t = t0
-    while t <= t1:
-        ts_list.append(t)
-        t = t + timedelta(seconds=interval)
-
-    n = len(ts_list)
+    topics = {
+        (object_, metric): f"{root}/{object_}/{metric}"
+        for object_, metric in [
+            ("config",  "ideal_ct_s"),
+            ("state",   "state_code"),
+            ("state",   "running"),
+            ("counter", "parts_total"),
+            ("counter", "parts_good"),
+            ("kpi",     "run_minutes_today"),
+            ("sensor",  "motor_current_a"),
+        ]
+    }
+
+    # Build timestamps (naive local datetime64 + fixed UTC offset suffix)
+    n = int((t1 - t0).total_seconds()) // interval + 1
+    ts64 = np.datetime64(t0.replace(tzinfo=None), "s") + np.arange(n) * np.timedelta64(interval, "s")
+    ts_iso = pd.Series(np.datetime_as_string(ts64, unit="s")) + t0.isoformat()[19:]
+
+    # Minute-of-day for every sample (t0 is local midnight)
+    mm = ((np.arange(n, dtype=np.int64) * interval) // 60).astype(np.int32)
 
     # State codes: 0 STOPPED, 2 RUN, 3 IDLE, 4 FAULT (rare)
     # Day profile:
     # 00:00–06:00 mostly STOPPED, 06:00–22:00 mostly RUN w/ small IDLE, 22:00–24:00 mixed
-    random.seed(7)
-    state_code = []
-    for t in ts_list:
-        mm = t.hour * 60 + t.minute
-        if 0 <= mm < 360:           # 00:00-06:00
-            s = 0 if random.random() < 0.9 else 3
-        elif 360 <= mm < 1320:      # 06:00-22:00
-            s = 2 if random.random() < 0.9 else 3
-        else:                        # 22:00-24:00
-            s = 2 if random.random() < 0.5 else 3
-        state_code.append(s)
+    # All randomness comes from one PCG64 generator, drawn in bulk
+    rng = np.random.default_rng(args.seed if args.seed >= 0 else None)
+    u_state = rng.random(n)
+    state_code = np.where(
+        mm < 360,                                           # 00:00-06:00
+        np.where(u_state < 0.9, 0, 3),
+        np.where(
+            mm < 1320,                                      # 06:00-22:00
+            np.where(u_state < 0.9, 2, 3),
+            np.where(u_state < 0.5, 2, 3),                  # 22:00-24:00
+        ),
+    )
 
     # Planned idle windows (IST)
     planned_windows = [(13*60, 13*60+30), (20*60, 20*60+15)]  # 13:00-13:30, 20:00-20:15
-    for i, t in enumerate(ts_list):
-        mm = t.hour * 60 + t.minute
-        for (a, b) in planned_windows:
-            if a <= mm < b:
-                state_code[i] = 3
+    for (a, b) in planned_windows:
+        state_code[(mm >= a) & (mm < b)] = 3
 
     # Short rare faults
     rare_faults = [(10*60+15, 3), (19*60+40, 4)]  # (start_min, dur_min)
-    for i, t in enumerate(ts_list):
-        mm = t.hour * 60 + t.minute
-        for (start_m, dur_m) in rare_faults:
-            if start_m <= mm < start_m + dur_m:
-                state_code[i] = 4
+    for (start_m, dur_m) in rare_faults:
+        state_code[(mm >= start_m) & (mm < start_m + dur_m)] = 4
 
-    running = [1 if s == 2 else 0 for s in state_code]
+    running = state_code == 2
 
     # Counters: simple part production while running; one part per ideal_ct_s
-    parts_total = []
-    parts_good  = []
-    run_minutes_today = []
-
-    pt = 0
-    pg = 0
-    run_sec_accum = 0.0
-    accum_cycle = 0.0
-
-    for i in range(n):
-        if running[i]:
-            run_sec_accum += interval
-            accum_cycle += interval
-            while accum_cycle >= ideal_ct_s:
-                accum_cycle -= ideal_ct_s
-                pt += 1
-                if random.random() >= reject_rate:
-                    pg += 1
-        # if not running: no increment
-        parts_total.append(pt)
-        parts_good.append(pg)
-        run_minutes_today.append(run_sec_accum / 60.0)
-
-    # Simple motor current
-    motor_current = []
-    for i in range(n):
-        s = state_code[i]
-        if s == 2:        # RUN
-            motor_current.append(10.0 + frand(0, 0.6))
-        elif s == 3:      # IDLE
-            motor_current.append(1.2 + frand(0, 0.2))
-        elif s == 4:      # FAULT
-            motor_current.append(0.3 + frand(0, 0.1))
-        else:             # STOPPED
-            motor_current.append(0.2 + frand(0, 0.1))
+    run_sec = np.cumsum(running, dtype=np.int64) * interval
+    parts_total = np.floor(run_sec / ideal_ct_s).astype(np.int64)
+    run_minutes_today = run_sec / 60.0
+
+    # One reject draw per completed part; good[k] = good parts among the first k
+    good_cum = np.zeros(parts_total[-1] + 1, dtype=np.int64)
+    u_reject = rng.random(parts_total[-1])
+    np.cumsum(u_reject >= reject_rate, out=good_cum[1:])
+    parts_good = good_cum[parts_total]
+
+    # Simple motor current: per-state mean/sigma indexed by state code
+    #                  STOPPED  (1)  RUN  IDLE  FAULT
+    mu    = np.array([0.2,     0.0, 10.0, 1.2,  0.3])
+    sigma = np.array([0.1,     0.0,  0.6, 0.2,  0.1])
+    motor_current = mu[state_code] + sigma[state_code] * rng.standard_normal(n)
 
     # Write CSV (one MQTT message per row)
+    # Payload values are formatted directly: the schema is fixed, so JSON
+    # literals are produced with %-formatting instead of json.dumps.
+    # Floats are written with 4 decimals to bound the payload width.
+    def fmt(values, spec):
+        return pd.Series([spec % v for v in values.tolist()])
+
+    # Every payload at a timestamp shares the same '{"ts":"...","value":'
+    # prefix: build it once and append only the value and tail per signal
+    prefix = '{"ts":"' + ts_iso + '","value":'
+
+    def payloads(prefix, values, unit=None):
+        tail = ',"q":"good"}' if unit is None else f',"q":"good","unit":"{unit}"}}'
+        return (prefix + values + tail).to_numpy()
+
+    bool_json = np.array(["false", "true"])
+
+    # Consumers keep the last value per topic, so slow signals are only
+    # emitted when they change (always on the first sample)
+    def changed(a):
+        return np.r_[True, a[1:] != a[:-1]]
+
+    elapsed_min = np.arange(n, dtype=np.int64) * interval // 60
+
+    # Time-series signals, in per-timestamp row order:
+    # (object, metric, formatted values, unit, emit mask)
+    signals = [
+        ("state",   "state_code", fmt(state_code, "%d"), None, changed(state_code)),
+        ("state",   "running", pd.Series(bool_json[running.astype(np.intp)]), None, changed(running)),
+        ("counter", "parts_total", fmt(parts_total, "%d"), "count", changed(parts_total)),
+        ("counter", "parts_good",  fmt(parts_good, "%d"),  "count", changed(parts_good)),
+        ("kpi",     "run_minutes_today", fmt(run_minutes_today, "%.4f"), "min", changed(elapsed_min)),
+        ("sensor",  "motor_current_a", fmt(motor_current, "%.4f"), "A", np.ones(n, dtype=bool)),
+    ]
+
+    # Each signal is formatted as a whole column (n x k), then the columns
+    # are row-interleaved by ravelling in timestamp-major order.
+    k = len(signals)
+    payload = np.empty((n, k), dtype=object)
+    keep = np.empty((n, k), dtype=bool)
+    for j, (object_, metric, values, unit, mask) in enumerate(signals):
+        payload[:, j] = payloads(prefix, values, unit)
+        keep[:, j] = mask | args.all_samples
+    keep = keep.ravel()
+
+    columns = [
+        np.repeat(ts_iso.to_numpy(), k)[keep],
+        np.tile(np.array([topics[(o, m)] for o, m, *_ in signals], dtype=object), n)[keep],
+        payload.ravel()[keep],
+        np.tile(np.array([o for o, *_ in signals], dtype=object), n)[keep],
+        np.tile(np.array([m for _, m, *_ in signals], dtype=object), n)[keep],
+    ]
+    labels = (site, line, machine)
+
     outfile = os.path.abspath(args.outfile)
-    with open(outfile, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(
-            f,
-            fieldnames=["ts_iso","topic","payload_json","site","line","machine","object","metric"]
-        )
-        w.writeheader()
-
-        def add_row(t, object_, metric, value, unit=None):
-            payload = {"ts": t.isoformat(), "value": value, "q": "good"}
-            if unit is not None:
-                payload["unit"] = unit
-            w.writerow({
-                "ts_iso": t.isoformat(),
-                "topic": topic(object_, metric),
-                "payload_json": json.dumps(payload, separators=(",",":")),
-                "site": site, "line": line, "machine": machine,
-                "object": object_, "metric": metric
-            })
-
-        # One-time config at start
-        add_row(ts_list[0], "config", "ideal_ct_s", ideal_ct_s, "s")
-
-        # Time-series rows
-        for i, t in enumerate(ts_list):
-            add_row(t, "state",   "state_code", int(state_code[i]))
-            add_row(t, "state",   "running", bool(running[i]))
-            add_row(t, "counter", "parts_total", int(parts_total[i]), "count")
-            add_row(t, "counter", "parts_good",  int(parts_good[i]),  "count")
-            add_row(t, "kpi",     "run_minutes_today", float(run_minutes_today[i]), "min")
-            add_row(t, "sensor",  "motor_current_a", float(motor_current[i]), "A")
-
-    # Create replayer script
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(["ts_iso","topic","payload_json","site","line","machine","object","metric"])
+    # One-time config at start
+    w.writerow([ts_iso[0], topics[("config", "ideal_ct_s")],
+                payloads(prefix[:1], fmt(np.array([ideal_ct_s]), "%.4f"), "s")[0],
+                site, line, machine, "config", "ideal_ct_s"])
+    chunks = [buf.getvalue().encode("utf-8")]
+
+    # Serialize row blocks, optionally across worker processes; blocks are
+    # independent and are written back in order.
+    jobs = max(1, args.jobs)
+    if jobs == 1:
+        chunks.append(format_rows(columns, labels))
+    else:
+        bounds = np.linspace(0, len(columns[0]), jobs + 1).astype(np.int64)
+        blocks = [[c[a:b] for c in columns] for a, b in zip(bounds[:-1], bounds[1:])]
+        with ProcessPoolExecutor(jobs) as ex:
+            chunks.extend(ex.map(format_rows, blocks, itertools.repeat(labels)))
+
+    # Hand the assembled file to the kernel in a single unbuffered write(2),
+    # looping only if the OS accepts a short write
+    data = memoryview(b"".join(chunks))
+    with open(outfile, "wb", buffering=0) as f:
+        while data:
+            data = data[f.write(data):]
+
+    # Copy the replayer script shipped next to this file
     replayer_path = os.path.abspath(args.replayer)
-    replayer_code = f'''#!/usr/bin/env python3
-import argparse, csv, json, time, ssl
-from datetime import datetime
-import paho.mqtt.client as mqtt
-
-def main():
-    ap = argparse.ArgumentParser(description="Simple MQTT CSV replayer")
-    ap.add_argument("--csv", required=True, help="Path to CSV (ts_iso,topic,payload_json)")
-    ap.add_argument("--host", required=True)
-    ap.add_argument("--port", type=int, default=8883)
-    ap.add_argument("--username")
-    ap.add_argument("--password")
-    ap.add_argument("--client-id", default="simple-replayer")
-    ap.add_argument("--qos", type=int, default=0)
-    ap.add_argument("--retain", action="store_true")
-    ap.add_argument("--speed", type=float, default=1.0, help="Time accel (1.0=real-time)")
-    ap.add_argument("--loop", action="store_true")
-    args = ap.parse_args()
-
-    client = mqtt.Client(client_id=args.client_id, protocol=mqtt.MQTTv311)
-    if args.username:
-        client.username_pw_set(args.username, args.password)
-
-    if args.port == 8883:
-        client.tls_set(cert_reqs=ssl.CERT_REQUIRED)
-        client.tls_insecure_set(False)
-
-    client.connect(args.host, args.port, keepalive=60)
-    client.loop_start()
-
-    def publish_once():
-        with open(args.csv, newline="", encoding="utf-8") as f:
-            r = csv.DictReader(f)
-            prev = None
-            for row in r:
-                topic = row["topic"]
-                payload = row["payload_json"]
-                try:
-                    t = datetime.fromisoformat(row["ts_iso"])
-                except Exception:
-                    t = None
-                if prev and t:
-                    dt = (t - prev).total_seconds()
-                    if dt > 0:
-                        time.sleep(dt / max(args.speed, 0.001))
-                prev = t
-                client.publish(topic, payload, qos=args.qos, retain=args.retain).wait_for_publish()
-
-    try:
-        if args.loop:
-            while True:
-                publish_once()
-        else:
-            publish_once()
-    except KeyboardInterrupt:
-        pass
-    finally:
-        client.loop_stop()
-        client.disconnect()
-
-if __name__ == "__main__":
-    main()
-'''
-    with open(replayer_path, "w", encoding="utf-8") as f:
-        f.write(replayer_code)
+    replayer_src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "simple_mqtt_replayer.py")
+    if not os.path.exists(replayer_path) or not os.path.samefile(replayer_src, replayer_path):
+        shutil.copyfile(replayer_src, replayer_path)
 
     # Make scripts executable on Unix
     try:
@@ -1,8 +1,33 @@
 #!/usr/bin/env python3
-import argparse, csv, json, time, ssl
+import argparse, csv, json, struct, time, ssl
+from collections import deque
 from datetime import datetime
 import paho.mqtt.client as mqtt
 
+# Max QoS 1/2 publishes awaiting acknowledgement before we block
+MAX_INFLIGHT = 256
+
+# --payload-format binary: value (float64), ts (int64 Unix ns), quality (uint8)
+BINARY_PAYLOAD = struct.Struct("<dqB")
+QUALITY_CODES = {"good": 0, "uncertain": 1, "bad": 2}
+
+def encode_binary(payload_json):
+    p = json.loads(payload_json)
+    ts_ns = round(datetime.fromisoformat(p["ts"]).timestamp() * 1e6) * 1000
+    return BINARY_PAYLOAD.pack(float(p["value"]), ts_ns, QUALITY_CODES.get(p.get("q"), 255))
+
+def payload_encoder(fmt):
+    # Returns a payload_json -> bytes transcoder, or None to publish as-is
+    if fmt == "json":
+        return None
+    if fmt == "binary":
+        return encode_binary
+    try:
+        import msgpack
+    except ImportError:
+        raise SystemExit("--payload-format msgpack requires: pip install msgpack")
+    return lambda payload_json: msgpack.packb(json.loads(payload_json))
+
 def main():
     ap = argparse.ArgumentParser(description="Simple MQTT CSV replayer")
     ap.add_argument("--csv", required=True, help="Path to CSV (ts_iso,topic,payload_json)")
@@ -15,7 +40,10 @@ def main():
     ap.add_argument("--retain", action="store_true")
     ap.add_argument("--speed", type=float, default=1.0, help="Time accel (1.0=real-time)")
     ap.add_argument("--loop", action="store_true")
+    ap.add_argument("--payload-format", choices=["json", "msgpack", "binary"], default="json",
+                    help="Wire format for payloads (CSV stays JSON; transcoded at load)")
     args = ap.parse_args()
+    encode = payload_encoder(args.payload_format)
 
     client = mqtt.Client(client_id=args.client_id, protocol=mqtt.MQTTv311)
     if args.username:
@@ -25,26 +53,64 @@ def main():
         client.tls_set(cert_reqs=ssl.CERT_REQUIRED)
         client.tls_insecure_set(False)
 
+    if args.qos > 0:
+        client.max_inflight_messages_set(MAX_INFLIGHT)
+
     client.connect(args.host, args.port, keepalive=60)
     client.loop_start()
 
-    def publish_once():
+    # QoS 0 has no acknowledgement to wait for. For QoS 1/2 keep a window of
+    # pipelined publishes and only block on the oldest once it is full.
+    inflight = deque()
+    client_publish = client.publish
+    qos, retain = args.qos, args.retain
+
+    if qos == 0:
+        def publish(topic, payload):
+            client_publish(topic, payload, 0, retain)
+    else:
+        def publish(topic, payload):
+            inflight.append(client_publish(topic, payload, qos, retain))
+            if len(inflight) >= MAX_INFLIGHT:
+                inflight.popleft().wait_for_publish()
+
+    def load_rows():
+        # Parse the CSV once: (topic, payload, seconds since start of replay).
+        # Payloads are stored as bytes so paho does not re-encode them on
+        # every pass, and each distinct topic string is stored only once.
+        rows = []
+        topics = {}
+        speed = max(args.speed, 0.001)
+        offset = 0.0
         with open(args.csv, newline="", encoding="utf-8") as f:
-            r = csv.DictReader(f)
             prev = None
-            for row in r:
-                topic = row["topic"]
-                payload = row["payload_json"]
+            for row in csv.DictReader(f):
                 try:
                     t = datetime.fromisoformat(row["ts_iso"])
                 except Exception:
                     t = None
                 if prev and t:
-                    dt = (t - prev).total_seconds()
-                    if dt > 0:
-                        time.sleep(dt / max(args.speed, 0.001))
+                    offset += max((t - prev).total_seconds(), 0.0) / speed
                 prev = t
-                client.publish(topic, payload, qos=args.qos, retain=args.retain).wait_for_publish()
+                topic = topics.setdefault(row["topic"], row["topic"])
+                payload = row["payload_json"]
+                payload = encode(payload) if encode else payload.encode("utf-8")
+                rows.append((topic, payload, offset))
+        return rows
+
+    rows = load_rows()
+
+    def publish_once():
+        # Sleep until each row's deadline rather than for each gap, so late
+        # wakeups and slow publishes do not accumulate into drift.
+        start = time.monotonic()
+        for topic, payload, offset in rows:
+            delay = start + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            publish(topic, payload)
+        while inflight:
+            inflight.popleft().wait_for_publish()
 
     try:
         if args.loop: